@@ -1,11 +1,14 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import DB_URL
+from metrics import instrument_engine
 
 
 DB_URL = DB_URL
+SQL_ECHO = False  # per-statement logging; query counts/timings are on /metrics
 
-engine = create_engine(DB_URL, echo=True) 
+engine = create_engine(DB_URL, echo=SQL_ECHO) 
+instrument_engine(engine)
 
 SessionLocal = sessionmaker(bind=engine)
 
@@ -0,0 +1,137 @@
+import base64
+import binascii
+import csv
+import json
+from datetime import datetime
+
+from db import SessionLocal
+from models import GmailAccount, Email, EmailAIResult
+
+EXPORT_BATCH = 1000  # rows per server-side cursor fetch and per response chunk
+
+EXPORT_FIELDS = [
+    "id",
+    "gmail_id",
+    "thread_id",
+    "from_email",
+    "subject",
+    "snippet",
+    "received_at",
+    "category",
+    "intent",
+    "urgency",
+    "summary",
+    "confidence",
+    "model_version",
+]
+
+
+def encode_cursor(email_id: int, since=None, until=None, category=None) -> str:
+    """
+    resume token: the last exported id plus the filters it was exported under.
+    """
+    state = {
+        "after_id": email_id,
+        "since": since.isoformat() if since is not None else None,
+        "until": until.isoformat() if until is not None else None,
+        "category": category,
+    }
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> dict:
+    """
+    returns {"after_id", "since", "until", "category"}; raises ValueError for tokens we did not hand out.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {
+            "after_id": int(state["after_id"]),
+            "since": datetime.fromisoformat(state["since"]) if state["since"] else None,
+            "until": datetime.fromisoformat(state["until"]) if state["until"] else None,
+            "category": state["category"],
+        }
+    except (binascii.Error, UnicodeDecodeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def _iter_rows(client_id: int, since=None, until=None, category=None, after_id=None):
+    # own session: the response body is produced after the request's get_db session is gone
+    session = SessionLocal()
+    try:
+        query = (
+            session.query(
+                Email.id,
+                Email.gmail_id,
+                Email.thread_id,
+                Email.from_email,
+                Email.subject,
+                Email.snippet,
+                Email.received_at,
+                EmailAIResult.category,
+                EmailAIResult.intent,
+                EmailAIResult.urgency,
+                EmailAIResult.summary,
+                EmailAIResult.confidence,
+                EmailAIResult.model_version,
+            )
+            .join(GmailAccount, Email.gmail_account_id == GmailAccount.id)
+            .outerjoin(EmailAIResult, EmailAIResult.email_id == Email.id)
+            .filter(GmailAccount.client_id == client_id)
+            .filter(Email.ai_parse_status == "done")
+        )
+        if since is not None:
+            query = query.filter(Email.received_at >= since)
+        if until is not None:
+            query = query.filter(Email.received_at < until)
+        if category is not None:
+            query = query.filter(EmailAIResult.category == category)
+        if after_id is not None:
+            query = query.filter(Email.id > after_id)
+
+        # keyset order on id keeps resume cheap; yield_per streams via a server-side cursor
+        for row in query.order_by(Email.id.asc()).yield_per(EXPORT_BATCH):
+            yield row
+    finally:
+        session.close()
+
+
+def _record(row, since=None, until=None, category=None, after_id=None) -> dict:
+    record = dict(zip(EXPORT_FIELDS, row))
+    if record["received_at"] is not None:
+        record["received_at"] = record["received_at"].isoformat()
+    record["cursor"] = encode_cursor(row.id, since, until, category)
+    return record
+
+
+def iter_ndjson(client_id: int, **filters):
+    chunk = []
+    for row in _iter_rows(client_id, **filters):
+        chunk.append(json.dumps(_record(row, **filters), ensure_ascii=False))
+        if len(chunk) >= EXPORT_BATCH:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+class _Line:
+    # csv.writer target that hands back the formatted line instead of buffering it
+    def write(self, value):
+        return value
+
+
+def iter_csv(client_id: int, **filters):
+    writer = csv.writer(_Line())
+    columns = EXPORT_FIELDS + ["cursor"]
+    chunk = [writer.writerow(columns)]
+    for row in _iter_rows(client_id, **filters):
+        record = _record(row, **filters)
+        chunk.append(writer.writerow([record[c] for c in columns]))
+        if len(chunk) >= EXPORT_BATCH:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
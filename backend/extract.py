@@ -0,0 +1,177 @@
+import re
+from email.parser import BytesFeedParser
+from html.parser import HTMLParser
+
+from storage import open_raw
+
+# body extraction for the AI prompt: pick the best text part, strip quoted replies and
+# signatures, and cut to a token budget. every stage is capped so a huge message costs
+# no more than a normal one.
+
+BODY_TOKEN_BUDGET = 400
+CHARS_PER_TOKEN = 4              # rough average for English; avoids a tokenizer dependency
+MAX_RAW_BYTES = 512 * 1024       # read at most this much of the raw message
+MAX_PART_BYTES = 64 * 1024       # decode at most this much of the chosen part
+READ_CHUNK = 16 * 1024
+MIN_BODY_CHARS = 40              # shorter cleaned bodies ("FYI", "see below") get the snippet too
+
+_QUOTE_HEADER = re.compile(
+    r"^\s*(On\s.{0,200}wrote:|Le\s.{0,200}a écrit\s?:|Am\s.{0,200}schrieb.{0,80}:)\s*$",
+    re.IGNORECASE,
+)
+_REPLY_MARKER = re.compile(r"^\s*(-{2,}\s*Original Message\s*-{2,}|_{10,})\s*$", re.IGNORECASE)
+# forwarded mail: only the marker and its header block are noise, the forwarded text is the content
+_FORWARD_MARKER = re.compile(
+    r"^\s*(-{2,}\s*Forwarded message\s*-{2,}|Begin forwarded message:)\s*$",
+    re.IGNORECASE,
+)
+_FORWARD_FIELD = re.compile(r"^\s*(From|Date|Sent|Subject|To|Cc|Reply-To):\s", re.IGNORECASE)
+_OUTLOOK_HEADER = re.compile(r"^\s*From:\s.+", re.IGNORECASE)
+_OUTLOOK_NEXT = re.compile(r"^\s*(Sent|Date|To):\s", re.IGNORECASE)
+_SIGNATURE = re.compile(
+    r"^\s*(--\s?|Sent from my \w+.*|Get Outlook for \w+.*)$",
+    re.IGNORECASE,
+)
+_BLANK_RUNS = re.compile(r"\n{3,}")
+
+
+class _TextExtractor(HTMLParser):
+    """
+    streaming html -> text: keeps text nodes, drops script/style, breaks lines at block tags.
+    no DOM is built, and it stops collecting once `limit` characters are gathered.
+    """
+
+    BLOCK_TAGS = {"p", "div", "br", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "table"}
+    SKIP_TAGS = {"script", "style", "head", "title"}
+
+    def __init__(self, limit: int):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.size = 0
+        self.parts = []
+        self.skip_depth = 0
+        self.quote_depth = 0
+
+    @property
+    def full(self) -> bool:
+        return self.size >= self.limit
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag == "blockquote":
+            # quoted replies in html mail
+            self.quote_depth += 1
+        if tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        elif tag == "blockquote" and self.quote_depth:
+            self.quote_depth -= 1
+        if tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self.skip_depth or self.quote_depth or self.full:
+            return
+        self.parts.append(data)
+        self.size += len(data)
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+def html_to_text(html: str, limit: int) -> str:
+    extractor = _TextExtractor(limit)
+    for start in range(0, len(html), READ_CHUNK):
+        extractor.feed(html[start:start + READ_CHUNK])
+        if extractor.full:
+            break
+    return extractor.text()
+
+
+def strip_quotes_and_signature(text: str) -> str:
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    kept = []
+    in_forward_header = False
+    for i, line in enumerate(lines):
+        if _FORWARD_MARKER.match(line):
+            in_forward_header = True
+            continue
+        if in_forward_header:
+            if not line.strip() or _FORWARD_FIELD.match(line):
+                continue
+            in_forward_header = False
+        if _QUOTE_HEADER.match(line) or _REPLY_MARKER.match(line) or _SIGNATURE.match(line):
+            break
+        # outlook-style reply header: "From: ..." followed by Sent:/Date:/To:
+        if kept and _OUTLOOK_HEADER.match(line) and i + 1 < len(lines) and _OUTLOOK_NEXT.match(lines[i + 1]):
+            break
+        if line.lstrip().startswith(">"):
+            continue
+        kept.append(line.rstrip())
+    return _BLANK_RUNS.sub("\n\n", "\n".join(kept)).strip()
+
+
+def truncate_to_budget(text: str, token_budget=BODY_TOKEN_BUDGET) -> str:
+    max_chars = token_budget * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > max_chars // 2 else max_chars].rstrip() + " …"
+
+
+def _decoded(part, limit: int) -> str:
+    payload = part.get_payload(decode=True) or b""
+    charset = part.get_content_charset() or "utf-8"
+    try:
+        return payload[:limit].decode(charset, errors="replace")
+    except LookupError:
+        # unknown charset label
+        return payload[:limit].decode("utf-8", errors="replace")
+
+
+def _pick_text(message, char_limit: int) -> str:
+    """
+    first inline text/plain part, else the first inline text/html part stripped to text.
+    """
+    html_part = None
+    for part in message.walk():
+        if part.is_multipart() or part.get_content_disposition() == "attachment":
+            continue
+        content_type = part.get_content_type()
+        if content_type == "text/plain":
+            return _decoded(part, MAX_PART_BYTES)
+        if content_type == "text/html" and html_part is None:
+            html_part = part
+
+    if html_part is not None:
+        return html_to_text(_decoded(html_part, MAX_PART_BYTES), char_limit)
+    return ""
+
+
+def extract_body(stream, token_budget=BODY_TOKEN_BUDGET) -> str:
+    """
+    prompt-ready body text from a raw message stream, reading at most MAX_RAW_BYTES.
+    """
+    parser = BytesFeedParser()
+    remaining = MAX_RAW_BYTES
+    while remaining > 0:
+        chunk = stream.read(min(READ_CHUNK, remaining))
+        if not chunk:
+            break
+        parser.feed(chunk)
+        remaining -= len(chunk)
+    message = parser.close()
+
+    # keep some slack over the budget: quote/signature stripping shortens the text
+    char_limit = token_budget * CHARS_PER_TOKEN * 4
+    text = _pick_text(message, char_limit)
+    return truncate_to_budget(strip_quotes_and_signature(text), token_budget)
+
+
+def extract_body_from_store(raw_sha256: str, token_budget=BODY_TOKEN_BUDGET) -> str:
+    with open_raw(raw_sha256) as stream:
+        return extract_body(stream, token_budget)
@@ -4,6 +4,13 @@ from oauth_handler import get_credentials
 from models import GmailAccount, Email
 from db import SessionLocal
 from datetime import datetime
+from email import policy
+from email.parser import BytesHeaderParser
+from storage import put_raw, RAW_UNAVAILABLE
+from search import index_emails, search_document
+from metrics import GMAIL_FETCH_SECONDS, GMAIL_MESSAGES_PER_SYNC, GMAIL_API_CALLS, GMAIL_FETCH_ERRORS
+import base64
+import time
 
 def get_gmail_service(creds):
     """
@@ -17,10 +24,22 @@ def get_gmail_service(creds):
         raise
 
 
+def _sender_and_subject(raw: bytes):
+    headers = BytesHeaderParser(policy=policy.default).parsebytes(raw)
+    sender = headers.get('From')
+    subject = headers.get('Subject')
+    return (
+        str(sender) if sender is not None else None,
+        str(subject) if subject is not None else None,
+    )
+
+
 def fetch_and_store_emails(gmail_account_id: int, max_results=10):
     """
     fetch unread emails for a gmail account and store them in Email table.
+    returns the number of new emails stored.
     """
+    started = time.perf_counter()
     session = SessionLocal()
     gmail_account = session.query(GmailAccount).filter(
         GmailAccount.id == gmail_account_id,
@@ -30,7 +49,7 @@ def fetch_and_store_emails(gmail_account_id: int, max_results=10):
     if not gmail_account:
         session.close()
         print(f"Gmail account {gmail_account_id} inactive or not found.")
-        return
+        return 0
 
     creds = get_credentials(gmail_account_id)
     service = get_gmail_service(creds)
@@ -42,24 +61,28 @@ def fetch_and_store_emails(gmail_account_id: int, max_results=10):
             labelIds=['INBOX', 'UNREAD'],
             maxResults=max_results
         ).execute()
+        GMAIL_API_CALLS.inc(method="list")
 
         messages = results.get('messages', [])
+        new_emails = []
         for msg in messages:
+            # skip if already exists, before spending quota on the full message
+            if session.query(Email).filter(Email.gmail_id == msg['id']).first():
+                continue
+
+            # raw format: one call gives us the full message to keep plus the snippet
             msg_detail = service.users().messages().get(
                 userId='me',
                 id=msg['id'],
-                format='full'
+                format='raw'
             ).execute()
+            GMAIL_API_CALLS.inc(method="get")
 
-            headers = msg_detail['payload'].get('headers', [])
+            raw = base64.urlsafe_b64decode(msg_detail['raw'])
+            raw_sha256 = put_raw(raw)
             snippet = msg_detail.get('snippet', '')
 
-            sender = next((h['value'] for h in headers if h['name'] == 'From'), None)
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), None)
-
-            # skip if already exists
-            if session.query(Email).filter(Email.gmail_id == msg['id']).first():
-                continue
+            sender, subject = _sender_and_subject(raw)
 
             email = Email(
                 gmail_account_id=gmail_account.id,
@@ -68,17 +91,81 @@ def fetch_and_store_emails(gmail_account_id: int, max_results=10):
                 from_email=sender,
                 subject=subject,
                 snippet=snippet,
+                raw_sha256=raw_sha256,
                 received_at=datetime.utcnow(),
                 ai_parse_status="pending"
             )
             session.add(email)
+            new_emails.append(email)
 
+        stored = len(new_emails)
+        if new_emails:
+            # ids are needed for the search index, which commits with the emails
+            session.flush()
+            index_emails(session, [search_document(e, gmail_account.client_id) for e in new_emails])
 
         gmail_account.last_fetched_at = datetime.utcnow()
         session.commit()
         session.close()
+        GMAIL_FETCH_SECONDS.observe(time.perf_counter() - started)
+        GMAIL_MESSAGES_PER_SYNC.observe(stored)
+        return stored
 
     except HttpError as error:
         session.close()
+        GMAIL_FETCH_ERRORS.inc()
+        GMAIL_FETCH_SECONDS.observe(time.perf_counter() - started)
         print(f"Gmail API error: {error}")
         raise
+
+
+def backfill_raw_store(gmail_account_id: int, batch_size=100):
+    """
+    one-time download of raw messages for emails ingested before the raw store existed.
+    after this, re-parsing and body extraction read from storage.py instead of Gmail.
+    messages Gmail no longer has (404) are marked RAW_UNAVAILABLE so they aren't retried.
+    returns the number of emails handled; 0 once the account is done.
+    """
+    session = SessionLocal()
+    emails = (
+        session.query(Email)
+        .filter(Email.gmail_account_id == gmail_account_id, Email.raw_sha256.is_(None))
+        .order_by(Email.id.asc())
+        .limit(batch_size)
+        .all()
+    )
+    if not emails:
+        session.close()
+        return 0
+
+    creds = get_credentials(gmail_account_id)
+    service = get_gmail_service(creds)
+
+    try:
+        for email in emails:
+            try:
+                msg_detail = service.users().messages().get(
+                    userId='me',
+                    id=email.gmail_id,
+                    format='raw'
+                ).execute()
+            except HttpError as error:
+                if error.resp.status != 404:
+                    raise
+                print(f"Message {email.gmail_id} is gone from Gmail, skipping")
+                email.raw_sha256 = RAW_UNAVAILABLE
+                continue
+            finally:
+                GMAIL_API_CALLS.inc(method="get")
+            email.raw_sha256 = put_raw(base64.urlsafe_b64decode(msg_detail['raw']))
+
+        session.commit()
+        session.close()
+        return len(emails)
+
+    except HttpError as error:
+        # keep what we got so far, the next run picks up the rest
+        session.commit()
+        session.close()
+        print(f"Gmail API error during backfill: {error}")
+        raise
@@ -0,0 +1,127 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+
+# argon2 cost parameters, calibrate with test/calibrate_argon2.py
+ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COST = 102400  # KiB
+ARGON2_PARALLELISM = 8
+
+# process pool bounds
+HASH_POOL_WORKERS = 2
+HASH_QUEUE_LIMIT = 32  # in-flight hashes (running + waiting) before we answer 503
+HASH_RETRY_AFTER = 1  # seconds
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_flight = 0
+
+
+def hash_password(password: str) -> str:
+    safe_password = password.encode("utf-8")[:72]
+    return pwd_context.hash(safe_password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    safe_password = plain_password.encode("utf-8")[:72]
+    return pwd_context.verify(safe_password, hashed_password)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the api process runs threads we must not clone
+            _pool = ProcessPoolExecutor(
+                max_workers=HASH_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _discard_pool(pool):
+    """
+    drop a broken pool (e.g. a worker was oom-killed); the next _get_pool starts a fresh one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _unavailable(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(HASH_RETRY_AFTER)},
+    )
+
+
+def _release(future=None):
+    global _in_flight
+    with _pool_lock:
+        _in_flight -= 1
+
+
+async def _run_in_pool(fn, *args):
+    """
+    run fn in the hash pool, rejecting with 503 once HASH_QUEUE_LIMIT hashes are in flight.
+    a pool broken by a dead worker is replaced and the call retried once.
+    """
+    global _in_flight
+    for attempt in range(2):
+        with _pool_lock:
+            if _in_flight >= HASH_QUEUE_LIMIT:
+                raise _unavailable("Authentication is busy, try again shortly")
+            _in_flight += 1
+
+        pool = _get_pool()
+        try:
+            future = pool.submit(fn, *args)
+        except RuntimeError:
+            # BrokenProcessPool, or shut down by a concurrent _discard_pool
+            _release()
+            _discard_pool(pool)
+            continue
+        except BaseException:
+            _release()
+            raise
+
+        # the slot is freed when the hash really ends, not when a disconnected request stops waiting
+        future.add_done_callback(_release)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+
+    raise _unavailable("Authentication is temporarily unavailable, try again shortly")
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_pool(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_pool(verify_password, plain_password, hashed_password)
@@ -0,0 +1,258 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import threading
+import time
+import uuid
+
+from gmail_client import fetch_and_store_emails
+from parser import parse_batch_real, BATCH_SIZE
+
+# job status constants
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# global gmail fetch budget (token bucket shared by scheduled polls and parse jobs)
+FETCH_BUDGET_PER_MINUTE = 60
+FETCH_BURST = 10
+
+MAX_PARSE_BATCHES_PER_RUN = 50  # bounds one run_parse call; the next trigger picks up the rest
+JOB_RETENTION = timedelta(hours=1)  # finished jobs stay queryable this long
+MAX_JOBS = 10000
+
+_lock = threading.Lock()
+_jobs = {}                  # job_id -> job dict
+_active_by_client = {}      # client_id -> job_id of its queued/running job
+_fetching_accounts = set()  # gmail_account_ids with a fetch in progress
+_parse_running = False
+_parse_rerun = False
+_parse_passes_started = 0
+_parse_passes_finished = 0
+_jobs_awaiting_parse = []   # jobs merged into the running parse, finished by the pass that covers them
+
+
+class FetchBudget:
+    """
+    token bucket: FETCH_BUDGET_PER_MINUTE fetches per minute, bursts up to FETCH_BURST.
+    """
+
+    def __init__(self, per_minute=FETCH_BUDGET_PER_MINUTE, burst=FETCH_BURST):
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+fetch_budget = FetchBudget()
+
+
+def _prune(now):
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job["finished_at"] and now - job["finished_at"] > JOB_RETENTION
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+    # still too many: drop the oldest finished ones
+    if len(_jobs) > MAX_JOBS:
+        finished = sorted(
+            (job for job in _jobs.values() if job["finished_at"]),
+            key=lambda job: job["finished_at"],
+        )
+        for job in finished[:len(_jobs) - MAX_JOBS]:
+            del _jobs[job["id"]]
+
+
+def submit_parse_job(client_id: int, gmail_account_ids):
+    """
+    register a fetch+parse job for a client. returns (job, created).
+    a trigger arriving while the client already has a queued/running job is merged into it.
+    """
+    now = datetime.utcnow()
+    with _lock:
+        _prune(now)
+
+        job_id = _active_by_client.get(client_id)
+        if job_id is not None:
+            job = _jobs[job_id]
+            job["triggers"] += 1
+            return dict(job), False
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "client_id": client_id,
+            "accounts": list(gmail_account_ids),
+            "status": QUEUED,
+            "triggers": 1,
+            "fetched": 0,
+            "skipped_accounts": 0,
+            "throttled_accounts": 0,
+            "errors": [],
+            "parse_pass": None,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+        }
+        _jobs[job["id"]] = job
+        _active_by_client[client_id] = job["id"]
+        return dict(job), True
+
+
+def get_job(job_id: str, client_id: int):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job["client_id"] != client_id:
+            return None
+        return dict(job, errors=list(job["errors"]))
+
+
+@contextmanager
+def account_fetch(gmail_account_id: int):
+    """
+    single-flight guard per gmail account. yields False if a fetch is already in progress.
+    """
+    with _lock:
+        acquired = gmail_account_id not in _fetching_accounts
+        if acquired:
+            _fetching_accounts.add(gmail_account_id)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with _lock:
+                _fetching_accounts.discard(gmail_account_id)
+
+
+def _finish_job(job, error=None):
+    # caller holds _lock
+    if error:
+        job["errors"].append(error)
+    job["status"] = FAILED if job["errors"] else DONE
+    job["finished_at"] = datetime.utcnow()
+    if _active_by_client.get(job["client_id"]) == job["id"]:
+        del _active_by_client[job["client_id"]]
+
+
+def _finish_covered_jobs():
+    # caller holds _lock
+    global _jobs_awaiting_parse
+    waiting = []
+    for job in _jobs_awaiting_parse:
+        if job["parse_pass"] <= _parse_passes_finished:
+            _finish_job(job)
+        else:
+            waiting.append(job)
+    _jobs_awaiting_parse = waiting
+
+
+def run_parse(batch_size=BATCH_SIZE, job=None) -> bool:
+    """
+    single-flight parse: runs parse_batch_real until no pending emails are left (or
+    MAX_PARSE_BATCHES_PER_RUN batches). if a parse is already running it is asked to do
+    one more pass instead of starting an overlapping one; returns False in that case,
+    and the given job (if any) is finished by the running parse once that pass is done.
+    """
+    global _parse_running, _parse_rerun, _parse_passes_started, _parse_passes_finished
+    with _lock:
+        if _parse_running:
+            _parse_rerun = True
+            if job is not None:
+                # the running pass may have claimed rows before this job's emails were
+                # stored, so only the pass after it is guaranteed to cover them
+                job["parse_pass"] = _parse_passes_started + 1
+                _jobs_awaiting_parse.append(job)
+            return False
+        _parse_running = True
+        _parse_passes_started += 1
+
+    batches = 0
+    finished = False
+    try:
+        while not finished:
+            claimed = parse_batch_real(batch_size)
+            batches += 1
+            # a full batch means more may be pending
+            if claimed >= batch_size and batches < MAX_PARSE_BATCHES_PER_RUN:
+                continue
+            with _lock:
+                _parse_passes_finished += 1
+                _finish_covered_jobs()
+                if _parse_rerun:
+                    _parse_rerun = False
+                    _parse_passes_started += 1
+                    batches = 0
+                else:
+                    _parse_running = False
+                    finished = True
+    except Exception as e:
+        with _lock:
+            _parse_running = False
+            _parse_rerun = False
+            # the passes these jobs were waiting for will not run
+            for waiting in _jobs_awaiting_parse:
+                _finish_job(waiting, f"parse: {e}")
+            _jobs_awaiting_parse.clear()
+        raise
+
+    return True
+
+
+def run_parse_job(job_id: str, max_results=2, batch_size=BATCH_SIZE):
+    with _lock:
+        job = _jobs[job_id]
+        job["status"] = RUNNING
+        job["started_at"] = datetime.utcnow()
+        account_ids = list(job["accounts"])
+
+    merged = False
+    try:
+        for gmail_account_id in account_ids:
+            with account_fetch(gmail_account_id) as acquired:
+                if not acquired:
+                    # someone else is already fetching this mailbox
+                    with _lock:
+                        job["skipped_accounts"] += 1
+                    continue
+                if not fetch_budget.take():
+                    # over the global fetch budget; the scheduler's next poll picks it up
+                    with _lock:
+                        job["throttled_accounts"] += 1
+                    continue
+                try:
+                    stored = fetch_and_store_emails(gmail_account_id, max_results=max_results)
+                    with _lock:
+                        job["fetched"] += stored or 0
+                except Exception as e:
+                    print(f"Job {job_id}: fetch failed for account {gmail_account_id}: {e}")
+                    with _lock:
+                        job["errors"].append(f"account {gmail_account_id}: {e}")
+
+        try:
+            # if another parse is running the job stays RUNNING and that parse finishes it,
+            # instead of this thread waiting for it
+            merged = not run_parse(batch_size, job=job)
+        except Exception as e:
+            print(f"Job {job_id}: parse failed: {e}")
+            with _lock:
+                job["errors"].append(f"parse: {e}")
+    except Exception as e:
+        print(f"Job {job_id} failed: {e}")
+        with _lock:
+            job["errors"].append(str(e))
+    finally:
+        if not merged:
+            with _lock:
+                _finish_job(job)
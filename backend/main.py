@@ -1,24 +1,54 @@
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import func
 from sqlalchemy.orm import Session, selectinload
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
-from datetime import datetime
-
-from db import get_db
-from models import Client, GmailAccount, Email
-from parser import parse_batch_real
-from gmail_client import fetch_and_store_emails
+from datetime import datetime, date, timedelta
+import time
+
+from db import get_db, engine
+from models import Client, GmailAccount, Email, EmailDailyRollup
+from jobs import submit_parse_job, run_parse_job, get_job
+from parser import PENDING, PROCESSING
+from export import iter_ndjson, iter_csv, decode_cursor
+from rollups import DIMENSIONS
+from search import (
+    ensure_search_index,
+    search_page,
+)
+from hashing import hash_password_async, verify_password_async, shutdown_pool
+from scheduler import start_scheduler, stop_scheduler
+from metrics import (
+    render_latest,
+    start_request_sql,
+    end_request_sql,
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUEST_SQL_QUERIES,
+    HTTP_REQUEST_SQL_SECONDS,
+    PARSE_QUEUE_DEPTH,
+)
 from utils import (
-    verify_password,
-    hash_password,
-    create_access_token,
+    create_client_token,
     get_current_user,
+    Principal,
 )
 
 
-app = FastAPI(title="LeadApp Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ensure_search_index(engine)
+    start_scheduler()
+    yield
+    stop_scheduler()
+    shutdown_pool()
+
+
+app = FastAPI(title="LeadApp Backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +58,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+def _observe_request(request: Request, started: float, status_code: int, stats):
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        method=request.method, route=path, status=status_code,
+    )
+    HTTP_REQUEST_SQL_QUERIES.observe(stats[0], route=path)
+    HTTP_REQUEST_SQL_SECONDS.observe(stats[1], route=path)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    stats, token = start_request_sql()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        _observe_request(request, started, 500, stats)
+        raise
+    finally:
+        end_request_sql(token)
+
+    # streamed bodies (e.g. /dashboard/export) run their queries while they are sent,
+    # so the request is recorded once the body is done, not when call_next returns
+    body = response.body_iterator
+
+    async def observed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            _observe_request(request, started, response.status_code, stats)
+
+    response.body_iterator = observed_body()
+    return response
+
+
 # Pydantic models 
 class EmailParsedOut(BaseModel):
     id: int
@@ -42,50 +111,84 @@ class EmailParsedOut(BaseModel):
     confidence: Optional[int]
 
 
+class SearchHitOut(EmailParsedOut):
+    rank: float
+
+
+class SearchOut(BaseModel):
+    results: List[SearchHitOut]
+    next_cursor: Optional[str]
+
+
 class SignupIn(BaseModel):
     username: str
     password: str
 
 
+class DayStatsOut(BaseModel):
+    day: date
+    category: Dict[str, int]
+    intent: Dict[str, int]
+    urgency: Dict[str, int]
+
+
+class StatsOut(BaseModel):
+    since: date
+    until: date
+    totals: Dict[str, Dict[str, int]]
+    days: List[DayStatsOut]
+
+
 class TokenOut(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
 
-# routes 
-@app.post("/signup", response_model=TokenOut)
-def signup(data: SignupIn, db: Session = Depends(get_db)):
+# db helpers for the async auth routes (password hashing runs in the hash pool)
+def _get_client_by_name(db: Session, name: str):
+    return db.query(Client).filter(Client.name == name).first()
 
-    if db.query(Client).filter(Client.name == data.username).first():
-        raise HTTPException(status_code=400, detail="Username already exists")
 
+def _create_client(db: Session, name: str, password_hash: str) -> Client:
     client = Client(
-        name=data.username,
+        name=name,
         notification_email="",
         is_active=True,
-        password_hash=hash_password(data.password),
+        password_hash=password_hash,
     )
 
     db.add(client)
     db.commit()
     db.refresh(client)
+    return client
+
+
+# routes 
+@app.post("/signup", response_model=TokenOut)
+async def signup(data: SignupIn, db: Session = Depends(get_db)):
+
+    if await run_in_threadpool(_get_client_by_name, db, data.username):
+        raise HTTPException(status_code=400, detail="Username already exists")
 
-    token = create_access_token({"sub": client.id})
+    password_hash = await hash_password_async(data.password)
+    client = await run_in_threadpool(_create_client, db, data.username, password_hash)
+
+    token = create_client_token(client)
     return {"access_token": token}
 
 
 @app.post("/login", response_model=TokenOut)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
 ):
-    client = db.query(Client).filter(Client.name == form_data.username).first()
-    if not client or not verify_password(
+    client = await run_in_threadpool(_get_client_by_name, db, form_data.username)
+    if not client or not await verify_password_async(
         form_data.password, client.password_hash
     ):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    token = create_access_token({"sub": str(client.id)})
+    token = create_client_token(client)
     return {"access_token": token}
 
 
@@ -94,7 +197,7 @@ def login(
 def dashboard_emails(
     limit: int = 50,
     offset: int = 0,
-    current_user: Client = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     emails = (
@@ -129,7 +232,7 @@ def dashboard_emails(
 @app.get("/dashboard/email/{email_id}", response_model=EmailParsedOut)
 def dashboard_email(
     email_id: int,
-    current_user: Client = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     email = (
@@ -159,15 +262,138 @@ def dashboard_email(
     )
 
 
-# Trigger fetch + parse 
-def _fetch_store_parse(gmail_account_id: int):
-    fetch_and_store_emails(gmail_account_id, max_results=2)
+@app.get("/dashboard/search", response_model=SearchOut)
+def dashboard_search(
+    q: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    try:
+        hits, next_cursor = search_page(db, current_user.id, q, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    emails = {
+        e.id: e
+        for e in db.query(Email)
+        .options(selectinload(Email.ai_result))
+        .join(GmailAccount, Email.gmail_account_id == GmailAccount.id)
+        .filter(GmailAccount.client_id == current_user.id)
+        .filter(Email.id.in_([email_id for email_id, _ in hits]))
+        .all()
+    } if hits else {}
+
+    results = []
+    for email_id, rank in hits:
+        e = emails.get(email_id)
+        if e is None:
+            continue
+        ai = e.ai_result
+        results.append(SearchHitOut(
+            id=e.id,
+            subject=e.subject,
+            snippet=e.snippet,
+            from_email=e.from_email,
+            received_at=e.received_at,
+            category=ai.category if ai else None,
+            intent=ai.intent if ai else None,
+            urgency=ai.urgency if ai else None,
+            summary=ai.summary if ai else None,
+            confidence=ai.confidence if ai else None,
+            rank=rank,
+        ))
+
+    return SearchOut(results=results, next_cursor=next_cursor)
+
+
+STATS_DEFAULT_DAYS = 30
+STATS_MAX_DAYS = 366
 
 
+@app.get("/dashboard/stats", response_model=StatsOut)
+def dashboard_stats(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    # answered from email_daily_rollups only: cost depends on the range, not on history size
+    until = until or datetime.utcnow().date()
+    since = since or until - timedelta(days=STATS_DEFAULT_DAYS - 1)
+    if since > until or (until - since).days >= STATS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must be 1-{STATS_MAX_DAYS} days")
+
+    rows = (
+        db.query(EmailDailyRollup.day, EmailDailyRollup.dimension, EmailDailyRollup.value, EmailDailyRollup.count)
+        .filter(
+            EmailDailyRollup.client_id == current_user.id,
+            EmailDailyRollup.day >= since,
+            EmailDailyRollup.day <= until,
+        )
+        .order_by(EmailDailyRollup.day.asc())
+        .all()
+    )
+
+    totals = {dimension: {} for dimension in DIMENSIONS}
+    days = {}
+    for day, dimension, value, count in rows:
+        bucket = days.setdefault(day, {d: {} for d in DIMENSIONS})
+        bucket[dimension][value] = count
+        totals[dimension][value] = totals[dimension].get(value, 0) + count
+
+    return StatsOut(
+        since=since,
+        until=until,
+        totals=totals,
+        days=[DayStatsOut(day=day, **dims) for day, dims in days.items()],
+    )
+
+
+@app.get("/dashboard/export")
+def export_emails(
+    format: str = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+):
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+
+    # every row carries a cursor; pass the last one received to resume
+    filters = {"since": since, "until": until, "category": category, "after_id": None}
+    if cursor:
+        try:
+            resume = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # the cursor carries the filters of the export it came from; they may be repeated, not changed
+        for name in ("since", "until", "category"):
+            if filters[name] is not None and filters[name] != resume[name]:
+                raise HTTPException(status_code=400, detail=f"{name} does not match the cursor")
+        filters = resume
+    if format == "csv":
+        body, media_type = iter_csv(current_user.id, **filters), "text/csv"
+    else:
+        body, media_type = iter_ndjson(current_user.id, **filters), "application/x-ndjson"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="emails.{format}"'},
+    )
+
+
+# Trigger fetch + parse 
 @app.post("/dashboard/parse")
 def trigger_parse(
     background_tasks: BackgroundTasks,
-    current_user: Client = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     gmail_accounts = (
@@ -182,18 +408,63 @@ def trigger_parse(
     if not gmail_accounts:
         raise HTTPException(status_code=400, detail="No connected Gmail accounts")
 
-    for ga in gmail_accounts:
-        background_tasks.add_task(_fetch_store_parse, ga.id)
+    # single-flight: a trigger while a job is in progress joins that job
+    job, created = submit_parse_job(current_user.id, [ga.id for ga in gmail_accounts])
+    if created:
+        background_tasks.add_task(run_parse_job, job["id"], 2, 10)
+
+    return {
+        "status": job["status"],
+        "job_id": job["id"],
+        "merged": not created,
+        "accounts": len(job["accounts"]),
+    }
+
 
-    background_tasks.add_task(parse_batch_real, 10)
+@app.get("/dashboard/parse/{job_id}")
+def parse_status(
+    job_id: str,
+    current_user: Principal = Depends(get_current_user),
+):
+    job = get_job(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
 
     return {
-        "status": "queued",
-        "accounts": len(gmail_accounts),
+        "job_id": job["id"],
+        "status": job["status"],
+        "accounts": len(job["accounts"]),
+        "triggers": job["triggers"],
+        "fetched": job["fetched"],
+        "skipped_accounts": job["skipped_accounts"],
+        "throttled_accounts": job["throttled_accounts"],
+        "errors": job["errors"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
     }
 
 
 
+QUEUED_PARSE_STATUSES = (PENDING, PROCESSING)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint(db: Session = Depends(get_db)):
+    # queue depth is read at scrape time; only the non-terminal statuses, which the
+    # ai_parse_status index keeps cheap. terminal totals are the parse_results_total counter
+    depth = dict.fromkeys(QUEUED_PARSE_STATUSES, 0)
+    depth.update(
+        db.query(Email.ai_parse_status, func.count(Email.id))
+        .filter(Email.ai_parse_status.in_(QUEUED_PARSE_STATUSES))
+        .group_by(Email.ai_parse_status)
+        .all()
+    )
+    PARSE_QUEUE_DEPTH.replace({(status,): count for status, count in depth.items()})
+
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -0,0 +1,208 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+import threading
+import time
+
+from sqlalchemy import event
+
+# in-process metrics rendered in the prometheus text format on /metrics.
+# recording is a lock + dict update, cheap enough to leave on in production.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=None) -> str:
+    pairs = [f'{k}="{_escape(v)}"' for k, v in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+        _registry.append(self)
+
+    def _key(self, labels) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        with self.lock:
+            items = list(self.values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def replace(self, values_by_labels):
+        """
+        swap in a full snapshot, e.g. {("pending",): 12, ("done",): 40}.
+        """
+        with self.lock:
+            self.values = dict(values_by_labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        with self.lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self.values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def render_latest() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# gmail ingestion
+GMAIL_FETCH_SECONDS = Histogram("gmail_fetch_seconds", "Duration of one fetch_and_store_emails sync")
+GMAIL_MESSAGES_PER_SYNC = Histogram(
+    "gmail_messages_per_sync", "New emails stored per sync",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250),
+)
+GMAIL_API_CALLS = Counter("gmail_api_calls_total", "Gmail API calls", ["method"])
+GMAIL_FETCH_ERRORS = Counter("gmail_fetch_errors_total", "Gmail syncs that failed")
+
+# ai parsing
+LLM_REQUEST_SECONDS = Histogram("llm_request_seconds", "Latency of one LLM completion", ["model"])
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens used", ["model", "kind"])
+LLM_RETRIES = Counter("llm_retries_total", "LLM calls retried after an API error")
+LLM_JSON_FAILURES = Counter("llm_json_failures_total", "LLM responses that were not valid JSON")
+BODY_EXTRACT_SECONDS = Histogram(
+    "body_extract_seconds", "Time to extract the prompt body from a stored raw message",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+PARSE_RESULTS = Counter("parse_results_total", "Parsed emails by final ai_parse_status", ["status"])
+PARSE_QUEUE_DEPTH = Gauge("parse_queue_depth", "Emails pending or being parsed", ["status"])
+
+# notifications
+NOTIFICATION_SEND_SECONDS = Histogram("notification_send_seconds", "SMTP send latency", ["channel"])
+NOTIFICATIONS = Counter("notifications_total", "Notifications by outcome", ["channel", "status"])
+
+# http + sql
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "HTTP request latency", ["method", "route", "status"],
+)
+HTTP_REQUEST_SQL_QUERIES = Histogram(
+    "http_request_sql_queries", "SQL queries issued per HTTP request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+HTTP_REQUEST_SQL_SECONDS = Histogram(
+    "http_request_sql_seconds", "Time spent in SQL per HTTP request", ["route"],
+)
+SQL_QUERY_SECONDS = Histogram("sql_query_seconds", "Duration of individual SQL statements")
+
+
+# per-request sql accounting: [query count, seconds], shared with threadpool workers via context copy
+_request_sql = ContextVar("request_sql", default=None)
+
+
+def start_request_sql():
+    stats = [0, 0.0]
+    return stats, _request_sql.set(stats)
+
+
+def end_request_sql(token):
+    _request_sql.reset(token)
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        SQL_QUERY_SECONDS.observe(elapsed)
+        stats = _request_sql.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
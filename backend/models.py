@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, JSON, DateTime, Boolean, func, ForeignKey
+from sqlalchemy import Column, Integer, String, JSON, DateTime, Date, Boolean, func, ForeignKey, UniqueConstraint
+from sqlalchemy import event
 from sqlalchemy.orm import relationship
 from db import Base  
 
@@ -13,6 +14,7 @@ class Client(Base):
     notification_email = Column(String, nullable=False)  # where alerts go
     
     is_active = Column(Boolean, default=True, index=True)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # bumped to revoke issued tokens
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -22,6 +24,28 @@ class Client(Base):
     notifications = relationship("Notification", back_populates="client")
 
 
+@event.listens_for(Client.password_hash, "set")
+@event.listens_for(Client.is_active, "set")
+def _revoke_tokens(target, value, oldvalue, initiator):
+    """
+    password change or deactivation bumps token_version so outstanding tokens stop working.
+    lives next to the model so every process that changes clients through the ORM gets it.
+    """
+    if target.id is None or value == oldvalue:
+        return
+    target.token_version = (target.token_version or 0) + 1
+
+
+def revoke_client_tokens(session, client_ids):
+    """
+    bump token_version for clients changed with a bulk query(Client).update(...), which
+    skips the attribute events above. call it in the same transaction as the update.
+    """
+    session.query(Client).filter(Client.id.in_(list(client_ids))).update(
+        {Client.token_version: Client.token_version + 1}, synchronize_session=False,
+    )
+
+
 class GmailAccount(Base):
     __tablename__ = "gmail_accounts"
 
@@ -56,6 +80,7 @@ class Email(Base):
     from_email = Column(String, index=True)
     subject = Column(String)
     snippet = Column(String)
+    raw_sha256 = Column(String(64))              # key of the raw message in storage.py
 
     received_at = Column(DateTime(timezone=True), index=True)
 
@@ -114,3 +139,20 @@ class Notification(Base):
 
     client = relationship("Client", back_populates="notifications")
     email = relationship("Email", back_populates="notifications")
+
+
+class EmailDailyRollup(Base):
+    __tablename__ = "email_daily_rollups"
+    __table_args__ = (
+        # also serves (client_id, day) range reads for /dashboard/stats
+        UniqueConstraint("client_id", "day", "dimension", "value", name="uq_email_daily_rollup"),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    day = Column(Date, nullable=False)
+
+    dimension = Column(String, nullable=False)   # category / intent / urgency
+    value = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
@@ -6,6 +6,7 @@ from email.mime.multipart import MIMEMultipart
 from db import SessionLocal
 from models import Email, Notification
 from config import EMAIL_FROM, EMAIL_APP_PASSWORD, SMTP_PORT
+from metrics import NOTIFICATION_SEND_SECONDS, NOTIFICATIONS
 
 
 SMTP_HOST = "smtp.gmail.com"
@@ -84,7 +85,8 @@ Urgency: {ai.urgency}
         session.flush() 
 
         try:
-            send_email(client.notification_email, subject, body)
+            with NOTIFICATION_SEND_SECONDS.time(channel="email"):
+                send_email(client.notification_email, subject, body)
 
             notification.status = "sent"
             print(f"Notification sent for email {email.id}")
@@ -94,5 +96,7 @@ Urgency: {ai.urgency}
             notification.error_message = str(e)
             print(f"Notification failed for email {email.id}: {e}")
 
+        NOTIFICATIONS.inc(channel="email", status=notification.status)
+
     session.commit()
     session.close()
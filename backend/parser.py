@@ -1,9 +1,22 @@
 from db import SessionLocal
-from models import Email, EmailAIResult
+from models import Email, EmailAIResult, GmailAccount
+from rollups import rollup_increments, apply_increments
+from search import index_emails, search_document
+from extract import extract_body_from_store, BODY_TOKEN_BUDGET, MIN_BODY_CHARS
+from storage import RAW_UNAVAILABLE
+from collections import Counter
 import time
 import openai
 from datetime import datetime
 from config import OPENAI_API_KEY
+from metrics import (
+    LLM_REQUEST_SECONDS,
+    LLM_TOKENS,
+    LLM_RETRIES,
+    LLM_JSON_FAILURES,
+    PARSE_RESULTS,
+    BODY_EXTRACT_SECONDS,
+)
 import json
 import re
 
@@ -16,12 +29,36 @@ FAILED = "failed"
 MAX_RETRIES = 3
 RETRY_DELAY = 2
 BATCH_SIZE = 10
+MODEL = "gpt-4.1-mini"
 
 openai.api_key = OPENAI_API_KEY  # set via env variable 
 
 
+def email_body(email, token_budget=BODY_TOKEN_BUDGET) -> str:
+    """
+    cleaned, budgeted body from the raw store; empty if the message was never stored.
+    """
+    if not email.raw_sha256 or email.raw_sha256 == RAW_UNAVAILABLE:
+        return ""
+    try:
+        with BODY_EXTRACT_SECONDS.time():
+            return extract_body_from_store(email.raw_sha256, token_budget)
+    except OSError as e:
+        print(f"Raw message unavailable for email {email.id}: {e}")
+        return ""
+
+
 def ai_parse_email(email):
-  
+
+    body = email_body(email)
+    # the snippet is just the start of the body, only send it when the body says next to nothing
+    if len(body) >= MIN_BODY_CHARS:
+        body_line = f"Email body: {body}"
+    elif body and email.snippet:
+        body_line = f"Email body: {body}\n        Email snippet: {email.snippet}"
+    else:
+        body_line = f"Email snippet: {email.snippet}"
+
     prompt = f"""
         You are an AI email parser. Classify the email and extract information.
         Instructions:
@@ -33,15 +70,21 @@ def ai_parse_email(email):
           - extracted_entities (list any names, emails, phone numbers, prices)
           - summary (one-line summary)
         Email subject: {email.subject}
-        Email snippet: {email.snippet}
+        {body_line}
         Return only JSON.
         """
 
-    response = openai.chat.completions.create(
-        model="gpt-4.1-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
-    )
+    with LLM_REQUEST_SECONDS.time(model=MODEL):
+        response = openai.chat.completions.create(
+            model=MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0
+        )
+
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        LLM_TOKENS.inc(usage.prompt_tokens or 0, model=MODEL, kind="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens or 0, model=MODEL, kind="completion")
 
     content = response.choices[0].message.content.strip()
 
@@ -55,14 +98,19 @@ def ai_parse_email(email):
             try:
                 result = json.loads(match.group())
             except json.JSONDecodeError:
+                LLM_JSON_FAILURES.inc()
                 raise ValueError(f"AI returned invalid JSON: {content}")
         else:
+            LLM_JSON_FAILURES.inc()
             raise ValueError(f"AI returned invalid JSON: {content}")
 
     return result
 
 
-def parse_batch_real(batch_size=BATCH_SIZE):
+def parse_batch_real(batch_size=BATCH_SIZE) -> int:
+    """
+    parse up to batch_size pending emails, returns how many were claimed.
+    """
     session = SessionLocal()
     
     emails = (
@@ -70,12 +118,23 @@ def parse_batch_real(batch_size=BATCH_SIZE):
         .filter(Email.ai_parse_status == PENDING)
         .order_by(Email.received_at.asc())
         .limit(batch_size)
+        .with_for_update(skip_locked=True)  # rows another worker is parsing are skipped
         .all()
     )
 
     print(f"Parsing {len(emails)} emails with AI...")
 
     to_commit = []  # batch commit
+    rollup_counts = Counter()
+    search_docs = []
+
+    # gmail account -> client, for the analytics rollups
+    account_ids = {email.gmail_account_id for email in emails}
+    client_by_account = dict(
+        session.query(GmailAccount.id, GmailAccount.client_id)
+        .filter(GmailAccount.id.in_(account_ids))
+        .all()
+    ) if account_ids else {}
 
     for email in emails:
         email.ai_parse_status = PROCESSING
@@ -100,10 +159,16 @@ def parse_batch_real(batch_size=BATCH_SIZE):
                     extracted_entities=result.get("extracted_entities"),
                     summary=result.get("summary"),
                     confidence=result.get("confidence", 90),
-                    model_version="gpt-4.1-mini",
+                    model_version=MODEL,
                     created_at=datetime.utcnow()
                 )
                 to_commit.append(ai_result)
+                rollup_counts += rollup_increments(
+                    client_by_account[email.gmail_account_id], email.received_at, ai_result,
+                )
+                search_docs.append(search_document(
+                    email, client_by_account[email.gmail_account_id], ai_result.summary,
+                ))
 
                 email.ai_parse_status = DONE
                 print(f"Email parsed successfully: {email.subject}")
@@ -116,18 +181,25 @@ def parse_batch_real(batch_size=BATCH_SIZE):
                 success = True
                 break
 
-            except openai.error.OpenAIError as e:
+            except openai.OpenAIError as e:
                 # api/network errors 
                 print(f"Attempt {attempt} failed for email {email.id}: {e}")
+                if attempt < MAX_RETRIES:
+                    LLM_RETRIES.inc()
                 time.sleep(RETRY_DELAY)
 
         if not success:
             email.ai_parse_status = FAILED
             print(f"Email marked as FAILED: {email.subject}")
 
-    # batch commit all changes at once
+        PARSE_RESULTS.inc(status=email.ai_parse_status)
+
+    # batch commit all changes at once, rollups and search index in the same transaction
     if to_commit:
         session.add_all(to_commit)
+        apply_increments(session, rollup_counts)
+        index_emails(session, search_docs)
         session.commit()
 
     session.close()
+    return len(emails)
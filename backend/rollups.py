@@ -0,0 +1,96 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import GmailAccount, Email, EmailAIResult, EmailDailyRollup
+
+DIMENSIONS = ("category", "intent", "urgency")
+UNKNOWN = "unknown"  # bucket for results where the model left a dimension empty
+
+
+def rollup_increments(client_id: int, received_at, ai_result) -> Counter:
+    """
+    rollup buckets one parsed email adds to: one per dimension.
+    """
+    day = (received_at or datetime.utcnow()).date()
+    return Counter({
+        (client_id, day, dimension, getattr(ai_result, dimension) or UNKNOWN): 1
+        for dimension in DIMENSIONS
+    })
+
+
+def apply_increments(session, increments: Counter):
+    """
+    add counts to the rollup table in the caller's transaction, so rollups commit
+    together with the parse results they describe.
+    """
+    if not increments:
+        return
+
+    # a fixed (client_id, day, dimension, value) order makes concurrent parsers lock
+    # shared buckets in the same order, so they wait on each other instead of deadlocking
+    rows = [
+        {"client_id": client_id, "day": day, "dimension": dimension, "value": value, "count": n}
+        for (client_id, day, dimension, value), n in sorted(increments.items())
+    ]
+
+    dialect = session.bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(EmailDailyRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["client_id", "day", "dimension", "value"],
+            set_={"count": EmailDailyRollup.count + stmt.excluded["count"]},
+        )
+        session.execute(stmt, rows)
+        return
+
+    # no upsert available: update, insert when the bucket doesn't exist yet
+    for row in rows:
+        updated = (
+            session.query(EmailDailyRollup)
+            .filter(
+                EmailDailyRollup.client_id == row["client_id"],
+                EmailDailyRollup.day == row["day"],
+                EmailDailyRollup.dimension == row["dimension"],
+                EmailDailyRollup.value == row["value"],
+            )
+            .update({EmailDailyRollup.count: EmailDailyRollup.count + row["count"]}, synchronize_session=False)
+        )
+        if not updated:
+            session.add(EmailDailyRollup(**row))
+
+
+def rebuild_rollups(session, client_id=None):
+    """
+    recompute rollups from emails + email_ai_results (all clients, or one).
+    repair path only: cost grows with history, unlike the incremental updates.
+    """
+    delete = session.query(EmailDailyRollup)
+    if client_id is not None:
+        delete = delete.filter(EmailDailyRollup.client_id == client_id)
+    delete.delete(synchronize_session=False)
+
+    for dimension in DIMENSIONS:
+        column = getattr(EmailAIResult, dimension)
+        day = func.date(Email.received_at)
+        value = func.coalesce(column, UNKNOWN)
+        query = (
+            select(GmailAccount.client_id, day, literal(dimension), value, func.count(Email.id))
+            .join(Email, Email.gmail_account_id == GmailAccount.id)
+            .join(EmailAIResult, EmailAIResult.email_id == Email.id)
+            .where(Email.ai_parse_status == "done")
+            .group_by(GmailAccount.client_id, day, value)
+        )
+        if client_id is not None:
+            query = query.where(GmailAccount.client_id == client_id)
+
+        session.execute(
+            EmailDailyRollup.__table__.insert().from_select(
+                ["client_id", "day", "dimension", "value", "count"], query,
+            )
+        )
+
+    session.commit()
@@ -0,0 +1,180 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import random
+import threading
+import time
+
+from sqlalchemy import func
+
+from db import SessionLocal
+from models import GmailAccount, Email
+from gmail_client import fetch_and_store_emails
+from jobs import account_fetch, run_parse, fetch_budget
+
+SCHEDULER_ENABLED = True
+TICK_SECONDS = 5
+ACCOUNT_REFRESH_SECONDS = 60   # how often the account list and arrival rates are reloaded
+
+# per-account poll interval bounds
+MIN_INTERVAL = 60              # seconds
+MAX_INTERVAL = 60 * 60
+RATE_WINDOW = timedelta(hours=24)
+TARGET_MESSAGES_PER_POLL = 5   # aim for this many new messages per fetch
+IDLE_BACKOFF = 2.0             # interval multiplier after a fetch that found nothing
+JITTER = 0.2                   # +/- fraction applied to every interval
+
+FETCH_WORKERS = 4
+SCHEDULED_MAX_RESULTS = 25
+
+
+def next_interval(recent_count: int, fetched=None, previous=None) -> float:
+    """
+    poll interval from the mailbox's arrival rate over RATE_WINDOW,
+    backing off further while polls keep coming back empty.
+    """
+    rate = recent_count / RATE_WINDOW.total_seconds()  # messages per second
+    interval = TARGET_MESSAGES_PER_POLL / rate if rate else MAX_INTERVAL
+
+    if fetched == 0 and previous:
+        interval = max(interval, previous * IDLE_BACKOFF)
+    elif fetched is not None and fetched >= SCHEDULED_MAX_RESULTS:
+        # the page was full, there is probably more waiting
+        interval = MIN_INTERVAL
+
+    return min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+
+
+def _jittered(interval: float) -> float:
+    return interval * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+class PollScheduler:
+    def __init__(self):
+        self.budget = fetch_budget  # shared with /dashboard/parse jobs
+        self.executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+        self.accounts = {}  # gmail_account_id -> {"due", "interval", "recent", "running"}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_refresh = 0.0
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name="gmail-poller", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=TICK_SECONDS * 2)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _refresh_accounts(self, now: float):
+        session = SessionLocal()
+        try:
+            last_fetched = dict(
+                session.query(GmailAccount.id, GmailAccount.last_fetched_at)
+                .filter(GmailAccount.is_active.is_(True))
+                .all()
+            )
+            cutoff = datetime.utcnow() - RATE_WINDOW
+            recent = dict(
+                session.query(Email.gmail_account_id, func.count(Email.id))
+                .filter(Email.received_at >= cutoff)
+                .group_by(Email.gmail_account_id)
+                .all()
+            )
+        finally:
+            session.close()
+
+        utcnow = datetime.utcnow()
+        with self.lock:
+            for account_id in list(self.accounts):
+                if account_id not in last_fetched:
+                    del self.accounts[account_id]
+
+            for account_id, last_fetched_at in last_fetched.items():
+                state = self.accounts.get(account_id)
+                if state is None:
+                    interval = next_interval(recent.get(account_id, 0))
+                    wait = 0.0
+                    if last_fetched_at is not None:
+                        if last_fetched_at.tzinfo is not None:
+                            last_fetched_at = last_fetched_at.astimezone(timezone.utc).replace(tzinfo=None)
+                        wait = max(0.0, interval - (utcnow - last_fetched_at).total_seconds())
+                    # spread first polls so a restart doesn't hit every mailbox at once
+                    self.accounts[account_id] = {
+                        "due": now + wait + random.uniform(0, min(interval, MIN_INTERVAL)),
+                        "interval": interval,
+                        "recent": recent.get(account_id, 0),
+                        "running": False,
+                    }
+                else:
+                    state["recent"] = recent.get(account_id, 0)
+
+        self.last_refresh = now
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            try:
+                if now - self.last_refresh >= ACCOUNT_REFRESH_SECONDS:
+                    self._refresh_accounts(now)
+                self._dispatch_due(now)
+            except Exception as e:
+                print(f"Scheduler tick failed: {e}")
+            self.stop_event.wait(TICK_SECONDS)
+
+    def _dispatch_due(self, now: float):
+        with self.lock:
+            due = sorted(
+                (state["due"], account_id)
+                for account_id, state in self.accounts.items()
+                if state["due"] <= now and not state["running"]
+            )
+
+            for _, account_id in due:
+                # over budget: leave the rest due, the most overdue go first next tick
+                if not self.budget.take():
+                    break
+                self.accounts[account_id]["running"] = True
+                self.executor.submit(self._poll, account_id)
+
+    def _poll(self, account_id: int):
+        fetched = 0
+        acquired = False
+        try:
+            with account_fetch(account_id) as acquired:
+                if acquired:
+                    fetched = fetch_and_store_emails(account_id, max_results=SCHEDULED_MAX_RESULTS) or 0
+            if fetched:
+                run_parse()
+        except Exception as e:
+            print(f"Scheduled fetch failed for account {account_id}: {e}")
+        finally:
+            with self.lock:
+                state = self.accounts.get(account_id)
+                if state is not None:
+                    # a fetch held by someone else (e.g. a dashboard job) says nothing about
+                    # mailbox activity: retry at the current interval instead of backing off
+                    if acquired:
+                        state["interval"] = next_interval(state["recent"] + fetched, fetched, state["interval"])
+                    state["due"] = time.monotonic() + _jittered(state["interval"])
+                    state["running"] = False
+
+
+_scheduler = None
+
+
+def start_scheduler():
+    global _scheduler
+    if not SCHEDULER_ENABLED or _scheduler is not None:
+        return
+    _scheduler = PollScheduler()
+    _scheduler.start()
+
+
+def stop_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
@@ -0,0 +1,206 @@
+import base64
+import binascii
+import json
+import re
+
+from sqlalchemy import text
+
+# full-text index over subject, snippet and AI summary.
+# postgres: email_search(email_id, client_id, document tsvector) with a GIN index.
+# sqlite: an FTS5 table keyed by rowid = email_id. other dialects: search is unavailable.
+
+TS_CONFIG = "english"
+SEARCH_MAX_LIMIT = 100
+
+_PG_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS email_search (
+        email_id INTEGER PRIMARY KEY REFERENCES emails(id) ON DELETE CASCADE,
+        client_id INTEGER NOT NULL,
+        document TSVECTOR NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_email_search_document ON email_search USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS ix_email_search_client_id ON email_search (client_id)",
+]
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS email_search USING fts5(
+        subject, snippet, summary, client_id UNINDEXED, tokenize = 'porter unicode61'
+    )
+    """,
+]
+
+# subject weighs most, then the AI summary, then the snippet
+_PG_DOCUMENT = f"""
+    setweight(to_tsvector('{TS_CONFIG}', coalesce(:subject, '')), 'A')
+    || setweight(to_tsvector('{TS_CONFIG}', coalesce(:summary, '')), 'B')
+    || setweight(to_tsvector('{TS_CONFIG}', coalesce(:snippet, '')), 'C')
+"""
+_SQLITE_BM25 = "bm25(email_search, 10.0, 2.0, 5.0, 0.0)"
+
+
+def _dialect(bind) -> str:
+    return bind.dialect.name
+
+
+def ensure_search_index(engine):
+    """
+    create the search table/index if missing. safe to call on every startup.
+    """
+    ddl = {"postgresql": _PG_DDL, "sqlite": _SQLITE_DDL}.get(_dialect(engine), [])
+    with engine.begin() as conn:
+        for statement in ddl:
+            conn.execute(text(statement))
+
+
+def search_document(email, client_id: int, summary=None) -> dict:
+    return {
+        "email_id": email.id,
+        "client_id": client_id,
+        "subject": email.subject,
+        "snippet": email.snippet,
+        "summary": summary,
+    }
+
+
+def index_emails(session, docs):
+    """
+    upsert search documents (see search_document) in the caller's transaction.
+    """
+    if not docs:
+        return
+
+    dialect = _dialect(session.bind)
+    if dialect == "postgresql":
+        session.execute(
+            text(f"""
+                INSERT INTO email_search (email_id, client_id, document)
+                VALUES (:email_id, :client_id, {_PG_DOCUMENT})
+                ON CONFLICT (email_id) DO UPDATE
+                SET client_id = EXCLUDED.client_id, document = EXCLUDED.document
+            """),
+            docs,
+        )
+    elif dialect == "sqlite":
+        # fts5 has no upsert: replace by rowid
+        session.execute(text("DELETE FROM email_search WHERE rowid = :email_id"), docs)
+        session.execute(
+            text("""
+                INSERT INTO email_search (rowid, subject, snippet, summary, client_id)
+                VALUES (:email_id, :subject, :snippet, :summary, :client_id)
+            """),
+            docs,
+        )
+
+
+def rebuild_search_index(session):
+    """
+    reindex every email from emails + email_ai_results, e.g. after enabling search on an existing db.
+    """
+    dialect = _dialect(session.bind)
+    source = """
+        FROM emails e
+        JOIN gmail_accounts ga ON ga.id = e.gmail_account_id
+        LEFT JOIN email_ai_results r ON r.email_id = e.id
+    """
+    if dialect == "postgresql":
+        document = (
+            _PG_DOCUMENT.replace(":subject", "e.subject")
+            .replace(":summary", "r.summary")
+            .replace(":snippet", "e.snippet")
+        )
+        session.execute(text("TRUNCATE email_search"))
+        session.execute(text(f"""
+            INSERT INTO email_search (email_id, client_id, document)
+            SELECT e.id, ga.client_id, {document} {source}
+        """))
+    elif dialect == "sqlite":
+        session.execute(text("DELETE FROM email_search"))
+        session.execute(text(f"""
+            INSERT INTO email_search (rowid, subject, snippet, summary, client_id)
+            SELECT e.id, e.subject, e.snippet, r.summary, ga.client_id {source}
+        """))
+    session.commit()
+
+
+def encode_cursor(rank: float, email_id: int) -> str:
+    raw = json.dumps([rank, email_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    """
+    returns (rank, email_id); raises ValueError for tokens we did not hand out.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        rank, email_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(rank), int(email_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def search_emails(session, client_id: int, query: str, limit=20, after=None):
+    """
+    ranked (email_id, rank) matches for one client, best first.
+    `after` is the (rank, email_id) of the last row of the previous page.
+    """
+    dialect = _dialect(session.bind)
+    params = {"client_id": client_id, "limit": min(limit, SEARCH_MAX_LIMIT)}
+    keyset = ""
+    if after is not None:
+        params["after_rank"], params["after_id"] = after
+        keyset = "WHERE rank < :after_rank OR (rank = :after_rank AND email_id > :after_id)"
+
+    if dialect == "postgresql":
+        params["query"] = query
+        # ts_rank is float4; as float8 the rank survives the JSON cursor exactly, so the
+        # keyset's rank = :after_rank still matches ties
+        matches = f"""
+            SELECT s.email_id, ts_rank(s.document, q.query)::float8 AS rank
+            FROM email_search s, websearch_to_tsquery('{TS_CONFIG}', :query) AS q(query)
+            WHERE s.client_id = :client_id AND s.document @@ q.query
+        """
+    elif dialect == "sqlite":
+        # quote every word so user input can't produce fts5 syntax errors
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return []
+        params["query"] = " ".join(f'"{term}"' for term in terms)
+        matches = f"""
+            SELECT rowid AS email_id, -{_SQLITE_BM25} AS rank
+            FROM email_search
+            WHERE email_search MATCH :query AND client_id = :client_id
+        """
+    else:
+        raise NotImplementedError(f"full-text search is not available on {dialect}")
+
+    rows = session.execute(
+        text(f"""
+            SELECT email_id, rank FROM ({matches}) AS matches
+            {keyset}
+            ORDER BY rank DESC, email_id ASC
+            LIMIT :limit
+        """),
+        params,
+    ).all()
+    return [(row.email_id, float(row.rank)) for row in rows]
+
+
+def search_page(session, client_id: int, query: str, limit=20, cursor=None):
+    """
+    one page of search_emails plus the cursor for the next one (None on the last page).
+    raises ValueError for a bad cursor.
+    """
+    limit = min(max(1, limit), SEARCH_MAX_LIMIT)
+    after = decode_cursor(cursor) if cursor else None
+    hits = search_emails(session, client_id, query, limit=limit, after=after)
+
+    # a full page means there may be more; resume after the last hit
+    next_cursor = None
+    if len(hits) == limit:
+        email_id, rank = hits[-1]
+        next_cursor = encode_cursor(rank, email_id)
+    return hits, next_cursor
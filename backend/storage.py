@@ -0,0 +1,51 @@
+import gzip
+import hashlib
+import os
+import tempfile
+
+# content-addressed store for raw RFC 822 messages.
+# blobs are gzip-compressed, named by the sha256 of the uncompressed bytes and sharded
+# two levels deep (ab/cd/abcd....gz), so identical messages are stored once.
+
+RAW_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "raw_store")
+COMPRESS_LEVEL = 6
+RAW_UNAVAILABLE = "unavailable"  # raw_sha256 marker for messages Gmail no longer has
+
+
+def _path(digest: str) -> str:
+    return os.path.join(RAW_STORE_DIR, digest[:2], digest[2:4], digest + ".gz")
+
+
+def put_raw(data: bytes) -> str:
+    """
+    store raw message bytes, returns their sha256 hex digest. no-op if already stored.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    path = _path(digest)
+    if os.path.exists(path):
+        return digest
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    # write to a temp file and rename, so readers never see a partial blob
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=COMPRESS_LEVEL, mtime=0) as gz:
+                gz.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    return digest
+
+
+def open_raw(digest: str):
+    """
+    streaming reader over the uncompressed message. raises FileNotFoundError if missing.
+    """
+    return gzip.open(_path(digest), "rb")
+
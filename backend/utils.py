@@ -1,30 +1,37 @@
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import NamedTuple
+import threading
+import time
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 from db import get_db
 from models import Client
+from hashing import hash_password, verify_password
 
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+# principal cache: bounds how long a revoked token keeps working on other processes
+PRINCIPAL_CACHE_TTL = 60  # seconds
+PRINCIPAL_CACHE_SIZE = 1024
 
 
-def hash_password(password: str) -> str:
-    safe_password = password.encode("utf-8")[:72]
-    return pwd_context.hash(safe_password)
+class Principal(NamedTuple):
+    id: int
+    name: str
+    is_active: bool
+    token_version: int
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    safe_password = plain_password.encode("utf-8")[:72]
-    return pwd_context.verify(safe_password, hashed_password)
+_principal_cache = OrderedDict()  # client_id -> (expires_at, Principal)
+_principal_lock = threading.Lock()
 
 
 
@@ -36,11 +43,57 @@ def create_access_token(data: dict):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def create_client_token(client: Client) -> str:
+    """
+    access token carrying the claims get_current_user needs to skip the db.
+    """
+    return create_access_token({
+        "sub": str(client.id),
+        "act": bool(client.is_active),
+        "tv": client.token_version or 0,
+    })
+
+
+
+def _cache_get(client_id: int):
+    with _principal_lock:
+        entry = _principal_cache.get(client_id)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at < time.monotonic():
+            del _principal_cache[client_id]
+            return None
+        _principal_cache.move_to_end(client_id)
+        return principal
+
+
+def _cache_put(principal: Principal):
+    with _principal_lock:
+        _principal_cache[principal.id] = (time.monotonic() + PRINCIPAL_CACHE_TTL, principal)
+        _principal_cache.move_to_end(principal.id)
+        while len(_principal_cache) > PRINCIPAL_CACHE_SIZE:
+            _principal_cache.popitem(last=False)
+
+
+def invalidate_principal(client_id: int):
+    with _principal_lock:
+        _principal_cache.pop(client_id, None)
+
+
+@event.listens_for(Client.password_hash, "set")
+@event.listens_for(Client.is_active, "set")
+def _drop_cached_principal(target, value, oldvalue, initiator):
+    # models._revoke_tokens bumps token_version; this process also forgets its cached copy
+    if target.id is not None and value != oldvalue:
+        invalidate_principal(target.id)
+
+
 
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
-) -> Client:
+) -> Principal:
     token = token.strip("'\"") 
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,12 +108,30 @@ def get_current_user(
         if user_id_str is None:
             raise credentials_exception
         user_id = int(user_id_str)
+        token_version = int(payload.get("tv", 0))
     except (JWTError, TypeError, ValueError) as e:
         raise credentials_exception
 
-    user = db.query(Client).filter(Client.id == user_id).first()
-    if user is None:
+    if payload.get("act") is False:
+        raise credentials_exception
+
+    # fast path: no db query while the cached principal is fresh. a token newer than the
+    # cached principal (e.g. issued by another worker after a password change) is a miss.
+    user = _cache_get(user_id)
+    if user is None or user.token_version < token_version:
+        client = db.query(Client).filter(Client.id == user_id).first()
+        if client is None:
+            raise credentials_exception
+        user = Principal(
+            id=client.id,
+            name=client.name,
+            is_active=bool(client.is_active),
+            token_version=client.token_version or 0,
+        )
+        _cache_put(user)
+
+    # a token older than the principal was revoked; one newer than the db was never issued
+    if not user.is_active or user.token_version != token_version:
         raise credentials_exception
-        
 
     return user
@@ -0,0 +1,28 @@
+# backend/backfill_raw_store.py
+# Download raw messages once for emails ingested before the raw store existed.
+from backend.db import SessionLocal
+from backend.models import GmailAccount
+from backend.gmail_client import backfill_raw_store
+
+session = SessionLocal()
+account_ids = [ga.id for ga in session.query(GmailAccount).filter(GmailAccount.is_active.is_(True)).all()]
+session.close()
+
+failed = 0
+for account_id in account_ids:
+    total = 0
+    try:
+        while True:
+            handled = backfill_raw_store(account_id, batch_size=100)
+            total += handled
+            if not handled:
+                break
+    except Exception as e:
+        # keep going with the other accounts; rerun later to finish this one
+        failed += 1
+        print(f"Gmail account {account_id}: backfill stopped after {total} messages: {e}")
+        continue
+    print(f"Gmail account {account_id}: {total} messages backfilled")
+
+if failed:
+    print(f"{failed} account(s) not finished, run again to resume")
@@ -0,0 +1,42 @@
+# test/bench/compare.py
+# Compare two run_pipeline.py result files stage by stage.
+#
+#   python test/bench/compare.py baseline.json candidate.json
+import argparse
+import json
+
+
+def _delta(old, new):
+    if old in (None, 0) or new is None:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("baseline")
+    ap.add_argument("candidate")
+    args = ap.parse_args()
+
+    with open(args.baseline) as f:
+        base = json.load(f)
+    with open(args.candidate) as f:
+        cand = json.load(f)
+
+    print(f"baseline:  {base['meta'].get('git_revision')} ({base['meta']['dialect']})")
+    print(f"candidate: {cand['meta'].get('git_revision')} ({cand['meta']['dialect']})")
+    print(f"\n{'stage':<8} {'metric':<18} {'baseline':>12} {'candidate':>12} {'delta':>9}")
+
+    for stage in base["stages"]:
+        if stage not in cand["stages"]:
+            continue
+        b, c = base["stages"][stage], cand["stages"][stage]
+        rows = [("throughput_per_s", b["throughput_per_s"], c["throughput_per_s"])]
+        for key in ("p50", "p95", "p99"):
+            rows.append((f"latency {key} ms", b["latency_ms"][key], c["latency_ms"][key]))
+        for name, old, new in rows:
+            print(f"{stage:<8} {name:<18} {str(old):>12} {str(new):>12} {_delta(old, new):>9}")
+
+
+if __name__ == "__main__":
+    main()
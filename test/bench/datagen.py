@@ -0,0 +1,120 @@
+# test/bench/datagen.py
+# Synthetic history for the benchmark: clients, Gmail accounts and already-processed emails
+# (with AI results and sent notifications), bulk inserted in chunks so it scales to 1M+ rows.
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from models import Client, GmailAccount, Email, EmailAIResult, Notification
+from rollups import rebuild_rollups
+from search import rebuild_search_index
+from fakes import CATEGORIES, INTENTS, URGENCIES, make_message
+
+CHUNK = 10000
+
+
+def _insert_chunks(session, model, rows):
+    for start in range(0, len(rows), CHUNK):
+        session.execute(insert(model), rows[start:start + CHUNK])
+
+
+def _sync_sequences(session):
+    # explicit ids were inserted; move postgres sequences past them
+    if session.bind.dialect.name != "postgresql":
+        return
+    for table in ("clients", "gmail_accounts", "emails", "email_ai_results", "notifications"):
+        session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+        ))
+
+
+def generate(session, seed=0, clients=10, accounts_per_client=2, emails=10000, days=90):
+    """
+    insert `clients` clients with `accounts_per_client` accounts each and spread `emails`
+    processed emails over them and the last `days` days. returns the created account ids.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    client_rows = [
+        {
+            "id": c,
+            "name": f"bench-client-{c}",
+            "password_hash": "!",
+            "notification_email": f"client{c}@example.com",
+            "is_active": True,
+            "token_version": 0,
+        }
+        for c in range(1, clients + 1)
+    ]
+    account_rows = [
+        {
+            "id": (c - 1) * accounts_per_client + a,
+            "client_id": c,
+            "gmail_address": f"client{c}.inbox{a}@example.com",
+            "gmail_token": {},
+            "is_active": True,
+            "last_fetched_at": now,
+        }
+        for c in range(1, clients + 1)
+        for a in range(1, accounts_per_client + 1)
+    ]
+    _insert_chunks(session, Client, client_rows)
+    _insert_chunks(session, GmailAccount, account_rows)
+    account_ids = [row["id"] for row in account_rows]
+
+    email_id = 0
+    for start in range(0, emails, CHUNK):
+        email_rows, result_rows, notification_rows = [], [], []
+        for _ in range(min(CHUNK, emails - start)):
+            email_id += 1
+            account_id = account_ids[email_id % len(account_ids)]
+            client_id = (account_id - 1) // accounts_per_client + 1
+            # history messages use negative numbers so they never clash with ingested ones
+            msg = make_message(seed, account_id, -email_id)
+            received_at = now - timedelta(seconds=rng.uniform(0, days * 86400))
+
+            email_rows.append({
+                "id": email_id,
+                "gmail_account_id": account_id,
+                "gmail_id": f"hist-{email_id}",
+                "thread_id": msg["threadId"],
+                "from_email": msg["from"],
+                "subject": msg["subject"],
+                "snippet": msg["snippet"],
+                "received_at": received_at,
+                "ai_parse_status": "done",
+                "ai_parse_version": "bench",
+            })
+            result_rows.append({
+                "id": email_id,
+                "email_id": email_id,
+                "category": rng.choice(CATEGORIES),
+                "intent": rng.choice(INTENTS),
+                "urgency": rng.choice(URGENCIES),
+                "extracted_entities": {},
+                "summary": msg["snippet"][:80],
+                "confidence": rng.randint(60, 99),
+                "model_version": "bench",
+            })
+            notification_rows.append({
+                "id": email_id,
+                "client_id": client_id,
+                "email_id": email_id,
+                "channel": "email",
+                "status": "sent",
+                "sent_to": f"client{client_id}@example.com",
+            })
+
+        session.execute(insert(Email), email_rows)
+        session.execute(insert(EmailAIResult), result_rows)
+        session.execute(insert(Notification), notification_rows)
+        session.commit()
+
+    _sync_sequences(session)
+    session.commit()
+    rebuild_rollups(session)
+    rebuild_search_index(session)
+    return account_ids
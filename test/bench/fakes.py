@@ -0,0 +1,270 @@
+# test/bench/fakes.py
+# Deterministic local stand-ins for the Gmail API, the OpenAI chat endpoint and SMTP.
+# Everything is seeded so two runs with the same arguments do the same work.
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+from email.message import EmailMessage
+from types import SimpleNamespace
+
+CATEGORIES = ["lead", "support", "billing", "partnership", "recruiting"]
+INTENTS = ["request", "complaint", "inquiry"]
+URGENCIES = ["low", "medium", "high"]
+WORDS = (
+    "invoice quote demo pricing meeting contract renewal outage refund upgrade "
+    "account order shipment deadline proposal integration onboarding trial "
+    "support ticket payment discount partnership interview schedule follow"
+).split()
+
+
+def _rng(*parts) -> random.Random:
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _sleep(ms: float, rng: random.Random):
+    if ms > 0:
+        # +/- 25% so latency distributions are not a single spike
+        time.sleep(ms * rng.uniform(0.75, 1.25) / 1000)
+
+
+def make_message(seed, account_id: int, n: int) -> dict:
+    """
+    synthetic message n of a mailbox; same inputs always give the same message.
+    """
+    rng = _rng(seed, "msg", account_id, n)
+    topic = rng.sample(WORDS, 3)
+    sender = f"{rng.choice(['alex', 'sam', 'jo', 'kim', 'lee'])}{rng.randint(1, 999)}@example.com"
+    subject = f"{topic[0].title()} {topic[1]} for {topic[2]}"
+    sentences = [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize() + "."
+        for _ in range(rng.randint(3, 12))
+    ]
+    body = "Hi,\n\n" + "\n".join(sentences) + f"\n\nThanks,\n{sender.split('@')[0]}\n"
+    return {
+        "id": f"a{account_id}m{n:08d}",
+        "threadId": f"a{account_id}t{n // 3:08d}",
+        "from": sender,
+        "subject": subject,
+        "body": body,
+        "snippet": body[4:204].replace("\n", " "),
+    }
+
+
+def mailbox_start(gmail_id) -> int:
+    """
+    message number after a stored fake gmail id ("a3m00000041" -> 42); 0 for anything else.
+    """
+    match = re.fullmatch(r"a\d+m(\d+)", gmail_id or "")
+    return int(match.group(1)) + 1 if match else 0
+
+
+class _Request:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def execute(self):
+        return self.fn()
+
+
+class FakeMailbox:
+    """
+    each list() call hands out the next page of never-seen unread messages, starting at
+    message number start_at (past what a kept database already holds).
+    """
+
+    def __init__(self, seed, account_id: int, latency_ms=0.0, start_at=0):
+        self.seed = seed
+        self.account_id = account_id
+        self.latency_ms = latency_ms
+        self.next_n = start_at
+        self.calls = 0
+        self.rng = _rng(seed, "gmail-latency", account_id)
+
+    def list(self, userId, labelIds=None, maxResults=100):
+        def run():
+            self.calls += 1
+            _sleep(self.latency_ms, self.rng)
+            start, self.next_n = self.next_n, self.next_n + maxResults
+            return {
+                "messages": [
+                    {"id": f"a{self.account_id}m{n:08d}", "threadId": f"a{self.account_id}t{n // 3:08d}"}
+                    for n in range(start, self.next_n)
+                ]
+            }
+        return _Request(run)
+
+    def get(self, userId, id, format="full"):
+        def run():
+            self.calls += 1
+            _sleep(self.latency_ms, self.rng)
+            n = int(id.split("m")[-1])
+            msg = make_message(self.seed, self.account_id, n)
+            detail = {"id": msg["id"], "threadId": msg["threadId"], "snippet": msg["snippet"]}
+            if format == "raw":
+                mime = EmailMessage()
+                mime["From"] = msg["from"]
+                mime["To"] = f"inbox{self.account_id}@example.com"
+                mime["Subject"] = msg["subject"]
+                mime.set_content(msg["body"])
+                detail["raw"] = base64.urlsafe_b64encode(mime.as_bytes()).decode()
+            else:
+                detail["payload"] = {
+                    "mimeType": "text/plain",
+                    "headers": [
+                        {"name": "From", "value": msg["from"]},
+                        {"name": "Subject", "value": msg["subject"]},
+                    ],
+                    "body": {"data": base64.urlsafe_b64encode(msg["body"].encode()).decode()},
+                }
+            return detail
+        return _Request(run)
+
+
+class FakeGmailService:
+    def __init__(self, mailbox: FakeMailbox):
+        self.mailbox = mailbox
+
+    def users(self):
+        return SimpleNamespace(messages=lambda: self.mailbox)
+
+
+class FakeOpenAIError(Exception):
+    pass
+
+
+class FakeOpenAI:
+    """
+    stands in for the `openai` module as used by parser.py (chat.completions.create + OpenAIError).
+    outcomes are derived from the prompt, so they don't depend on parse order.
+    """
+
+    OpenAIError = FakeOpenAIError
+
+    def __init__(self, seed, latency_ms=50.0, error_rate=0.0, bad_json_rate=0.0, spam_rate=0.05):
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.bad_json_rate = bad_json_rate
+        self.spam_rate = spam_rate
+        self.calls = 0
+        self.errors = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, temperature=0, **kwargs):
+        prompt = messages[-1]["content"]
+        self.calls += 1
+        # the call number is mixed in so a retried prompt can succeed
+        rng = _rng(self.seed, "llm", prompt, self.calls)
+        _sleep(self.latency_ms, rng)
+
+        if rng.random() < self.error_rate:
+            self.errors += 1
+            raise FakeOpenAIError("simulated API error")
+
+        outcome = _rng(self.seed, "llm-outcome", prompt)
+        roll = outcome.random()
+        if roll < self.bad_json_rate:
+            content = "Sorry, I can't help with that."
+        elif roll < self.bad_json_rate + self.spam_rate:
+            content = json.dumps({"category": "spam"})
+        else:
+            content = json.dumps({
+                "category": outcome.choice(CATEGORIES),
+                "intent": outcome.choice(INTENTS),
+                "urgency": outcome.choice(URGENCIES),
+                "extracted_entities": {"emails": [f"contact{outcome.randint(1, 99)}@example.com"]},
+                "summary": " ".join(outcome.choice(WORDS) for _ in range(8)),
+                "confidence": outcome.randint(60, 99),
+            })
+
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4),
+        )
+
+
+class FakeSMTP:
+    """
+    drop-in for smtplib.SMTP; records sends instead of delivering them.
+    timings holds, per successful send, the seconds since the previous one (or since
+    start_timing), i.e. one notification end to end: queries, message build and SMTP.
+    """
+
+    latency_ms = 0.0
+    error_rate = 0.0
+    sent = 0
+    timings = []
+    _last = None
+    _rng = random.Random(0)
+
+    @classmethod
+    def start_timing(cls):
+        cls.timings = []
+        cls._last = time.perf_counter()
+
+    def __init__(self, host, port):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def send_message(self, msg):
+        _sleep(FakeSMTP.latency_ms, FakeSMTP._rng)
+        if FakeSMTP._rng.random() < FakeSMTP.error_rate:
+            raise OSError("simulated SMTP failure")
+        FakeSMTP.sent += 1
+        now = time.perf_counter()
+        if FakeSMTP._last is not None:
+            FakeSMTP.timings.append(now - FakeSMTP._last)
+        FakeSMTP._last = now
+
+
+def install(seed, gmail_latency_ms=0.0, llm_latency_ms=50.0, llm_error_rate=0.0,
+            llm_bad_json_rate=0.0, smtp_latency_ms=0.0, smtp_error_rate=0.0):
+    """
+    patch gmail_client, parser and notifier to use the fakes. returns the fake objects.
+    """
+    import gmail_client
+    import notifier
+    import parser
+
+    mailboxes = {}
+    mailbox_starts = {}  # gmail_account_id -> first message number to hand out, see mailbox_start
+
+    def get_mailbox(gmail_account_id):
+        if gmail_account_id not in mailboxes:
+            mailboxes[gmail_account_id] = FakeMailbox(
+                seed, gmail_account_id, gmail_latency_ms, mailbox_starts.get(gmail_account_id, 0),
+            )
+        return mailboxes[gmail_account_id]
+
+    # credentials are just the account id; the service is that account's mailbox
+    gmail_client.get_credentials = lambda gmail_account_id: gmail_account_id
+    gmail_client.get_gmail_service = lambda creds: FakeGmailService(get_mailbox(creds))
+
+    llm = FakeOpenAI(seed, llm_latency_ms, llm_error_rate, llm_bad_json_rate)
+    parser.openai = llm
+    parser.RETRY_DELAY = 0
+
+    FakeSMTP.latency_ms = smtp_latency_ms
+    FakeSMTP.error_rate = smtp_error_rate
+    FakeSMTP._rng = random.Random(seed)
+    FakeSMTP.sent = 0
+    FakeSMTP.timings = []
+    FakeSMTP._last = None
+    notifier.smtplib = SimpleNamespace(SMTP=FakeSMTP)
+
+    return SimpleNamespace(mailboxes=mailboxes, mailbox_starts=mailbox_starts, llm=llm, smtp=FakeSMTP)
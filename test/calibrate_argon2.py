@@ -0,0 +1,67 @@
+# test/calibrate_argon2.py
+# Times argon2 hashing for a grid of cost parameters so ARGON2_* in backend/hashing.py
+# can be picked for this hardware. Run: python test/calibrate_argon2.py --target-ms 250
+import argparse
+import statistics
+import time
+
+from passlib.hash import argon2
+
+from backend.hashing import (
+    ARGON2_TIME_COST,
+    ARGON2_MEMORY_COST,
+    ARGON2_PARALLELISM,
+    HASH_POOL_WORKERS,
+)
+
+
+def time_hash(time_cost, memory_cost, parallelism, rounds):
+    hasher = argon2.using(
+        time_cost=time_cost,
+        memory_cost=memory_cost,
+        parallelism=parallelism,
+    )
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        hasher.hash(b"calibration-password")
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--target-ms", type=float, default=250, help="desired median hash time")
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--parallelism", type=int, default=ARGON2_PARALLELISM)
+    args = ap.parse_args()
+
+    current = time_hash(ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM, args.rounds)
+    print(
+        f"current: time_cost={ARGON2_TIME_COST} memory_cost={ARGON2_MEMORY_COST} "
+        f"parallelism={ARGON2_PARALLELISM} -> {current:.1f} ms"
+    )
+
+    best = None
+    for memory_cost in (19456, 32768, 65536, 102400):
+        for time_cost in (1, 2, 3, 4):
+            ms = time_hash(time_cost, memory_cost, args.parallelism, args.rounds)
+            print(f"time_cost={time_cost} memory_cost={memory_cost:>6} -> {ms:7.1f} ms")
+            # strongest setting that still fits the target
+            if ms <= args.target_ms and (best is None or (memory_cost * time_cost) > (best[1] * best[0])):
+                best = (time_cost, memory_cost, ms)
+
+    if best is None:
+        print("No setting fits the target; lower memory_cost or raise --target-ms.")
+        return
+
+    time_cost, memory_cost, ms = best
+    print(
+        f"\nsuggested: ARGON2_TIME_COST={time_cost} ARGON2_MEMORY_COST={memory_cost} "
+        f"ARGON2_PARALLELISM={args.parallelism} ({ms:.1f} ms)"
+    )
+    print(f"~{HASH_POOL_WORKERS * 1000 / ms:.0f} logins/sec with HASH_POOL_WORKERS={HASH_POOL_WORKERS}")
+
+
+if __name__ == "__main__":
+    main()
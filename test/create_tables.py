@@ -1,7 +1,10 @@
 # backend/create_tables.py
 from backend.db import engine, Base
-from backend.models import Client, GmailAccount, Email, EmailAIResult, Notification
+from backend.models import Client, GmailAccount, Email, EmailAIResult, Notification, EmailDailyRollup
+
+from backend.search import ensure_search_index
 
 # This reads all imported models and creates corresponding tables in the DB
 Base.metadata.create_all(bind=engine)
+ensure_search_index(engine)
 print("All tables created!")
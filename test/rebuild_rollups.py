@@ -0,0 +1,15 @@
+# backend/rebuild_rollups.py
+# Recompute email_daily_rollups from emails + email_ai_results.
+# Usage: python test/rebuild_rollups.py [client_id]
+import sys
+
+from backend.db import SessionLocal
+from backend.rollups import rebuild_rollups
+
+client_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
+session = SessionLocal()
+rebuild_rollups(session, client_id)
+session.close()
+
+print(f"Rollups rebuilt for {'client ' + str(client_id) if client_id else 'all clients'}.")
@@ -0,0 +1,12 @@
+# backend/rebuild_search_index.py
+# Reindex every stored email for /dashboard/search (e.g. after enabling search on an existing db).
+from backend.db import SessionLocal, engine
+from backend.search import ensure_search_index, rebuild_search_index
+
+ensure_search_index(engine)
+
+session = SessionLocal()
+rebuild_search_index(session)
+session.close()
+
+print("Search index rebuilt.")